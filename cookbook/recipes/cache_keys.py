@@ -0,0 +1,11 @@
+# Cache entries for the recipe listings, shared by the views that fill them and
+# the signals in signals.py that clear them when recipes change. The signals
+# only fire for ORM writes, not for import_json_recipes.py or
+# generate_embeddings.py, and only clear the writing process's cache unless
+# REDIS_URL configures a shared one, so the timeouts stay short.
+TOP_RECIPES_CACHE_KEY = "top_recipes_v1"
+TOP_RECIPES_CACHE_TIMEOUT = 60 * 5
+RECIPE_STATS_CACHE_KEY = "recipe_statistics_v1"
+RECIPE_STATS_CACHE_TIMEOUT = 60 * 5
+CUISINES_CACHE_KEY = "recipe_cuisines_v1"
+CUISINES_CACHE_TIMEOUT = 60 * 5
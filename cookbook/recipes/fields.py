@@ -0,0 +1,18 @@
+from bson.binary import VECTOR_SUBTYPE, Binary
+from django.db import models
+
+
+class VectorField(models.BinaryField):
+    """
+    Binary field holding a BSON vector (binData subtype 9)
+
+    BinaryField wraps whatever it saves in a generic Binary, resetting the
+    subtype to 0, and Atlas then no longer indexes the value as a vector.
+    This field always writes packed bytes back with the vector subtype, and
+    passes embeddings still stored as arrays of floats through unchanged.
+    """
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None or isinstance(value, list):
+            return value
+        return Binary(bytes(value), VECTOR_SUBTYPE)
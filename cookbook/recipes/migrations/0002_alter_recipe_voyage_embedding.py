@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-14 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="voyage_embedding",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
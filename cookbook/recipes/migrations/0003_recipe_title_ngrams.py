@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-14 14:05
+
+import django_mongodb_backend.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0002_alter_recipe_voyage_embedding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="title_ngrams",
+            field=django_mongodb_backend.fields.ArrayField(
+                base_field=models.CharField(max_length=3),
+                blank=True,
+                editable=False,
+                null=True,
+                size=None,
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-14 14:40
+
+from django.db import migrations
+
+import recipes.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0003_recipe_title_ngrams"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="voyage_embedding",
+            field=recipes.fields.VectorField(blank=True, null=True),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django_mongodb_backend.fields import ArrayField, EmbeddedModelField
 from django_mongodb_backend.managers import MongoManager
 from django_mongodb_backend.models import EmbeddedModel
 
+from .fields import VectorField
+from .search import title_ngrams
+
 
 class Features(EmbeddedModel):
     preparation_time = models.CharField(max_length=100)
@@ -13,11 +16,16 @@ class Features(EmbeddedModel):
 
 class Recipe(models.Model):
     title = models.CharField(max_length=200)
+    # Trigrams of the title used by the fuzzy search, kept in sync by save()
+    title_ngrams = ArrayField(
+        models.CharField(max_length=3), null=True, blank=True, editable=False
+    )
     instructions = models.TextField(blank=True)
     features = EmbeddedModelField(Features, null=True, blank=True)
     ingredients = ArrayField(models.CharField(max_length=100), null=True, blank=True)
     embedding_ingredients = models.CharField(max_length=500, null=True, blank=True)
-    voyage_embedding = models.JSONField(null=True, blank=True)
+    # Packed float32 vector (BSON binData subtype 9)
+    voyage_embedding = VectorField(null=True, blank=True)
 
     objects = MongoManager()
 
@@ -25,5 +33,12 @@ class Recipe(models.Model):
         db_table = "recipes"
         managed = False
 
+    def save(self, *args, **kwargs):
+        self.title_ngrams = title_ngrams(self.title)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "title" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "title_ngrams"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Recipe {self.title}"
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+# Largest number of embedded recipes searched in-process with NumPy; larger
+# collections use Atlas $vectorSearch. 0 (the default) always uses Atlas.
+RECIPE_INDEX_MAX_DOCS = int(os.getenv("RECIPE_INDEX_MAX_DOCS", "0"))
+# Seconds before the in-process snapshot is rebuilt, picking up embeddings
+# written outside the ORM (e.g. by generate_embeddings.py)
+RECIPE_INDEX_TTL = int(os.getenv("RECIPE_INDEX_TTL", "300"))
+
+# Recipes holding an actual embedding; recipes saved through the ORM store null
+EMBEDDED_RECIPES = {"voyage_embedding": {"$type": ["binData", "array"]}}
+
+
+def title_ngrams(text, n=3):
+    """
+    Lower-cased character n-grams of a title, as stored in each recipe's
+    `title_ngrams` array and matched by the fuzzy search
+
+    Args:
+        text (str): Title or search query
+        n (int): Length of each n-gram
+
+    Returns:
+        list: The distinct n-grams of the text
+    """
+    text = text.lower()
+    return sorted({text[i : i + n] for i in range(len(text) - n + 1)})
+
+
+def embedding_array(embedding):
+    """
+    Decode a stored embedding into a float32 NumPy array
+
+    Args:
+        embedding: Packed float32 BSON vector, or a list of floats as written
+            by older versions of generate_embeddings.py
+
+    Returns:
+        numpy.ndarray: The embedding
+    """
+    if isinstance(embedding, (bytes, memoryview)):
+        # Packed vectors start with a dtype byte and a padding byte
+        return np.frombuffer(embedding, dtype="<f4", offset=2)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+class RecipeIndex:
+    """
+    Exhaustive in-memory vector index over every recipe embedding
+
+    For modest collections the whole embedding matrix fits in RAM, and a
+    single matrix-vector product scores every recipe faster than a round-trip
+    to the HNSW index. The index is built on first use and rebuilt once it is
+    older than RECIPE_INDEX_TTL; call `invalidate()` to rebuild it sooner.
+    """
+
+    _instance = None
+    _loaded_at = None
+    _lock = threading.Lock()
+
+    def __init__(self, collection):
+        ids = []
+        rows = []
+        cursor = collection.find(EMBEDDED_RECIPES, {"_id": 1, "voyage_embedding": 1})
+        for doc in cursor:
+            ids.append(doc["_id"])
+            rows.append(embedding_array(doc["voyage_embedding"]))
+
+        # Contiguous, row-normalized float32 so BLAS gets aligned lanes and
+        # the dot product is the cosine similarity
+        if rows:
+            embeddings = np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        else:
+            embeddings = np.empty((0, 0), dtype=np.float32)
+
+        self.ids = ids
+        self.embeddings = embeddings
+
+    @classmethod
+    def get(cls, collection):
+        """
+        Return the shared index, loading it on first use and once it expires
+
+        Args:
+            collection: pymongo collection holding the recipes
+
+        Returns:
+            RecipeIndex: The index, or None when in-process search is disabled
+            or the collection has outgrown RECIPE_INDEX_MAX_DOCS
+        """
+        # Disabled, so skip counting the embedded recipes (a collection scan)
+        if RECIPE_INDEX_MAX_DOCS <= 0:
+            return None
+        if cls._expired():
+            with cls._lock:
+                if cls._expired():
+                    cls._instance = None
+                    try:
+                        count = collection.count_documents(EMBEDDED_RECIPES)
+                        if 0 < count <= RECIPE_INDEX_MAX_DOCS:
+                            index = cls(collection)
+                            cls._instance = index if index.ids else None
+                    finally:
+                        # Failed loads also wait for the TTL before retrying,
+                        # rather than rescanning the collection every request
+                        cls._loaded_at = time.monotonic()
+        return cls._instance
+
+    @classmethod
+    def _expired(cls):
+        return (
+            cls._loaded_at is None
+            or time.monotonic() - cls._loaded_at >= RECIPE_INDEX_TTL
+        )
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the shared index so the next search reloads it"""
+        with cls._lock:
+            cls._instance = None
+            cls._loaded_at = None
+
+    def search(self, query_embedding, limit):
+        """
+        Find the recipes most similar to a query embedding
+
+        Args:
+            query_embedding (list): Embedding of the search query
+            limit (int): Maximum number of recipes to return
+
+        Returns:
+            list: (recipe id, score, embedding) tuples, most similar first.
+                Scores use the same (1 + cosine) / 2 scale as $vectorSearch.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = self.embeddings @ (query / np.linalg.norm(query))
+
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            (self.ids[i], float((1 + scores[i]) / 2), self.embeddings[i]) for i in top
+        ]
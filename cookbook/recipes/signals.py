@@ -0,0 +1,21 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_keys import (
+    CUISINES_CACHE_KEY,
+    RECIPE_STATS_CACHE_KEY,
+    TOP_RECIPES_CACHE_KEY,
+)
+from .models import Recipe
+from .search import RecipeIndex
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_caches(sender, **kwargs):
+    """Drop the cached listings and vector index after a recipe is written"""
+    cache.delete_many(
+        [TOP_RECIPES_CACHE_KEY, RECIPE_STATS_CACHE_KEY, CUISINES_CACHE_KEY]
+    )
+    RecipeIndex.invalidate()
@@ -1,3 +1,431 @@
-from django.test import TestCase
+import hashlib
+import importlib.util
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from bson import ObjectId
+from bson.binary import VECTOR_SUBTYPE, Binary, BinaryVectorDtype
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import RequestFactory, SimpleTestCase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from . import views
+from .cache_keys import (
+    CUISINES_CACHE_KEY,
+    RECIPE_STATS_CACHE_KEY,
+    TOP_RECIPES_CACHE_KEY,
+)
+from .fields import VectorField
+from .models import Recipe
+from .search import RecipeIndex, title_ngrams
+from .views import mmr_rerank
+
+
+def load_script(name):
+    """Import one of the maintenance scripts kept at the repository root"""
+    path = settings.BASE_DIR.parent / f"{name}.py"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class VectorFieldTests(SimpleTestCase):
+    def test_packed_vectors_are_saved_with_the_vector_subtype(self):
+        vector = Binary.from_vector([0.5, 1.5], BinaryVectorDtype.FLOAT32)
+
+        for value in (vector, bytes(vector), Binary(bytes(vector))):
+            prepared = VectorField().get_db_prep_value(value, connection=None)
+            self.assertEqual(prepared.subtype, VECTOR_SUBTYPE)
+            self.assertEqual(prepared.as_vector().data, [0.5, 1.5])
+
+    def test_arrays_and_null_pass_through(self):
+        field = VectorField()
+
+        self.assertEqual(field.get_db_prep_value([0.5], connection=None), [0.5])
+        self.assertIsNone(field.get_db_prep_value(None, connection=None))
+
+
+class TitleNgramsTests(SimpleTestCase):
+    def test_short_query_has_no_trigrams(self):
+        self.assertEqual(title_ngrams(""), [])
+        self.assertEqual(title_ngrams("ab"), [])
+
+    def test_trigrams_are_distinct_and_lower_cased(self):
+        self.assertEqual(title_ngrams("Abab"), ["aba", "bab"])
+
+
+class StubCollection:
+    """Stands in for the pymongo recipes collection RecipeIndex reads"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def count_documents(self, filter):
+        return len(self.docs)
+
+    def find(self, filter, projection):
+        return iter(self.docs)
+
+
+class RecipeIndexTests(SimpleTestCase):
+    docs = [
+        {"_id": "opposite", "voyage_embedding": [-1.0, 0.0]},
+        {"_id": "diagonal", "voyage_embedding": [2.0, 2.0]},
+        {
+            "_id": "exact",
+            "voyage_embedding": Binary.from_vector(
+                [3.0, 0.0], BinaryVectorDtype.FLOAT32
+            ),
+        },
+        {"_id": "orthogonal", "voyage_embedding": [0.0, 1.0]},
+    ]
+
+    def setUp(self):
+        RecipeIndex.invalidate()
+        self.addCleanup(RecipeIndex.invalidate)
+        self.index = RecipeIndex(StubCollection(self.docs))
+
+    def test_search_returns_top_matches_in_order(self):
+        results = self.index.search([1.0, 0.0], limit=2)
+
+        recipe_ids = [recipe_id for recipe_id, _, _ in results]
+        self.assertEqual(recipe_ids, ["exact", "diagonal"])
+        self.assertAlmostEqual(results[0][1], 1.0, places=5)
+        self.assertAlmostEqual(results[1][1], (1 + np.sqrt(0.5)) / 2, places=5)
+
+    def test_search_scores_use_vector_search_scale(self):
+        results = self.index.search([1.0, 0.0], limit=10)
+
+        scores = {recipe_id: score for recipe_id, score, _ in results}
+        self.assertEqual(len(results), 4)
+        self.assertAlmostEqual(scores["orthogonal"], 0.5, places=5)
+        self.assertAlmostEqual(scores["opposite"], 0.0, places=5)
+        self.assertEqual(results[-1][0], "opposite")
+
+    def test_get_loads_small_collections(self):
+        with mock.patch("recipes.search.RECIPE_INDEX_MAX_DOCS", 10):
+            index = RecipeIndex.get(StubCollection(self.docs))
+
+        self.assertEqual(len(index.ids), 4)
+
+    def test_get_skips_collections_over_the_limit(self):
+        with mock.patch("recipes.search.RECIPE_INDEX_MAX_DOCS", 3):
+            self.assertIsNone(RecipeIndex.get(StubCollection(self.docs)))
+
+    def test_disabled_index_never_queries_the_collection(self):
+        collection = mock.Mock()
+        with mock.patch("recipes.search.RECIPE_INDEX_MAX_DOCS", 0):
+            self.assertIsNone(RecipeIndex.get(collection))
+
+        collection.count_documents.assert_not_called()
+
+
+class MMRRerankTests(SimpleTestCase):
+    query = [1.0, 1.0, 0.0]
+    embeddings = [
+        [1.0, 0.0, 0.0],
+        # Near-duplicate of the first candidate, and slightly more relevant
+        [1.0, 0.05, 0.0],
+        [0.0, 1.0, 0.0],
+    ]
+
+    def test_prefers_diverse_result_over_near_duplicate(self):
+        self.assertEqual(mmr_rerank(self.query, self.embeddings, k=2), [1, 2])
+
+    def test_pure_relevance_keeps_similarity_order(self):
+        self.assertEqual(
+            mmr_rerank(self.query, self.embeddings, k=2, lambda_mult=1), [1, 0]
+        )
+
+    def test_returns_every_candidate_when_k_exceeds_them(self):
+        self.assertEqual(
+            sorted(mmr_rerank(self.query, self.embeddings, k=10)), [0, 1, 2]
+        )
+
+
+class EmbedQueryTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        views._embed_query.cache_clear()
+        self.addCleanup(views._embed_query.cache_clear)
+
+        voyage = mock.Mock()
+        voyage.embed.return_value = SimpleNamespace(embeddings=[[0.5, -1.25, 3.0]])
+        patcher = mock.patch.object(views, "_voyage_client", return_value=voyage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.voyage = voyage
+
+    def test_embedding_round_trips_through_django_cache(self):
+        self.assertEqual(views._embed_query("pasta"), (0.5, -1.25, 3.0))
+
+        # A fresh process only has the packed bytes in Django's cache
+        views._embed_query.cache_clear()
+        self.assertEqual(views._embed_query("pasta"), (0.5, -1.25, 3.0))
+        self.voyage.embed.assert_called_once()
+
+    def test_cache_key_names_the_model(self):
+        views._embed_query("pasta")
+
+        digest = hashlib.sha1(b"pasta").hexdigest()
+        key = f"vemb:{views.QUERY_EMBEDDING_MODEL}:{digest}"
+        self.assertIsNotNone(cache.get(key))
+
+
+class RecipeCacheSignalTests(SimpleTestCase):
+    def test_saving_a_recipe_clears_cached_listings_and_index(self):
+        keys = [TOP_RECIPES_CACHE_KEY, RECIPE_STATS_CACHE_KEY, CUISINES_CACHE_KEY]
+        cache.set_many({key: ["stale"] for key in keys})
+        RecipeIndex._instance = mock.sentinel.index
+        RecipeIndex._loaded_at = 0.0
+        self.addCleanup(RecipeIndex.invalidate)
+
+        post_save.send(sender=Recipe, instance=Recipe(title="Soup"), created=True)
+
+        self.assertEqual(cache.get_many(keys), {})
+        self.assertIsNone(RecipeIndex._instance)
+        self.assertIsNone(RecipeIndex._loaded_at)
+
+
+class KnownCuisinesTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.collection = mock.Mock()
+        patcher = mock.patch.object(
+            views, "_recipes_collection", return_value=self.collection
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lists_named_cuisines_in_order(self):
+        self.collection.distinct.return_value = ["Thai", None, "", "Italian"]
+
+        self.assertEqual(views.known_cuisines(), ["Italian", "Thai"])
+
+    def test_database_error_leaves_filter_without_choices(self):
+        self.collection.distinct.side_effect = PyMongoError("down")
+
+        with mock.patch("builtins.print"):
+            self.assertEqual(views.known_cuisines(), [])
+        self.assertIsNone(cache.get(CUISINES_CACHE_KEY))
+
+
+class RecipeStatisticsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.collection = mock.Mock()
+        patcher = mock.patch.object(
+            views, "_recipes_collection", return_value=self.collection
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_falls_back_to_unhinted_aggregation_without_the_index(self):
+        stats = [{"_id": "Thai", "cuisine": "Thai", "count": 2}]
+        self.collection.aggregate.side_effect = [OperationFailure("bad hint"), stats]
+
+        with mock.patch.object(views, "render") as render:
+            views.recipe_statistics(RequestFactory().get("/statistics/"))
+
+        first, second = self.collection.aggregate.call_args_list
+        self.assertEqual(first.kwargs, {"hint": views.CUISINE_INDEX})
+        self.assertEqual(second.kwargs, {})
+        self.assertEqual(render.call_args.args[2], {"cuisine_stats": stats})
+
+
+def recipe_hit(number, score):
+    """A search hit as returned by the fuzzy_search pipelines"""
+    return {
+        "_id": ObjectId(),
+        "title": f"Recipe {number}",
+        "ingredients": [f"ingredient {number}"],
+        "score": score,
+    }
+
+
+class FuzzySearchTests(SimpleTestCase):
+    def setUp(self):
+        self.collection = mock.Mock()
+        patcher = mock.patch.object(
+            views, "_recipes_collection", return_value=self.collection
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, query):
+        return views.fuzzy_search(RequestFactory().get("/fuzzy-search/", {"q": query}))
+
+    def rendered_results(self, query):
+        with mock.patch.object(views, "render") as render:
+            self.search(query)
+        return render.call_args.args[2]["results"]
+
+    def test_titles_need_the_minimum_trigram_overlap(self):
+        self.collection.aggregate.return_value = [
+            recipe_hit(number, 1.0) for number in range(10)
+        ]
+
+        self.search("Pasta")
+
+        (pipeline,), _ = self.collection.aggregate.call_args
+        self.assertEqual(
+            pipeline[0], {"$match": {"title_ngrams": {"$in": title_ngrams("pasta")}}}
+        )
+        self.assertIn(
+            {"$match": {"score": {"$gte": views.MIN_NGRAM_OVERLAP}}}, pipeline
+        )
+
+    def test_enough_title_matches_skip_atlas_search(self):
+        self.collection.aggregate.return_value = [
+            recipe_hit(number, 1.0) for number in range(views.MIN_NGRAM_MATCHES)
+        ]
+
+        results = self.rendered_results("recipe")
+
+        self.collection.aggregate.assert_called_once()
+        self.assertEqual(len(results), views.MIN_NGRAM_MATCHES)
+
+    def test_atlas_hits_lead_when_few_titles_match(self):
+        shared, title_only, atlas_only = (recipe_hit(n, 0.5) for n in range(3))
+        self.collection.aggregate.side_effect = [
+            [shared, title_only],
+            [atlas_only, {**shared, "score": 7.0}],
+        ]
+
+        results = self.rendered_results("recipe")
+
+        self.assertIn("$search", self.collection.aggregate.call_args.args[0][0])
+        self.assertEqual(
+            [result["title"] for result in results],
+            ["Recipe 2", "Recipe 0", "Recipe 1"],
+        )
+        self.assertEqual(results[1]["score"], 7.0)
+
+    def test_short_query_goes_straight_to_atlas_search(self):
+        self.collection.aggregate.return_value = [recipe_hit(0, 2.0)]
+
+        results = self.rendered_results("pa")
+
+        (pipeline,), _ = self.collection.aggregate.call_args
+        self.collection.aggregate.assert_called_once()
+        self.assertIn("$search", pipeline[0])
+        self.assertEqual(len(results), 1)
+
+    def test_results_are_rendered(self):
+        hits = [recipe_hit(number, 0.75) for number in range(10)]
+        self.collection.aggregate.return_value = hits
+
+        response = self.search("recipe")
+
+        self.assertContains(response, "Recipe 9")
+        self.assertContains(response, "ingredient 9")
+        self.assertContains(response, "Relevance: 0.75")
+        self.assertContains(response, f"/recipe/{hits[0]['_id']}/")
+
+
+class ClaudeSuggestionsTests(SimpleTestCase):
+    def setUp(self):
+        self.anthropic = mock.Mock()
+        patcher = mock.patch.object(
+            views, "_anthropic_client", return_value=self.anthropic
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def respond_with(self, *blocks):
+        self.anthropic.messages.create.return_value = SimpleNamespace(content=blocks)
+
+    def test_suggestions_come_from_the_forced_tool_call(self):
+        suggestions = [{"name": f"Meal {number}"} for number in range(6)]
+        self.respond_with(
+            SimpleNamespace(type="text", text="Here you go"),
+            SimpleNamespace(type="tool_use", input={"suggestions": suggestions}),
+        )
+
+        result = views.get_claude_suggestions(["rice"], [], max_suggestions=4)
+
+        self.assertEqual(result, suggestions[:4])
+        _, kwargs = self.anthropic.messages.create.call_args
+        self.assertEqual(
+            kwargs["tool_choice"],
+            {"type": "tool", "name": views.MEAL_SUGGESTIONS_TOOL["name"]},
+        )
+
+    def test_no_tool_call_means_no_suggestions(self):
+        self.respond_with(SimpleNamespace(type="text", text="Sorry"))
+
+        self.assertEqual(views.get_claude_suggestions(["rice"], []), [])
+
+
+class RateLimiterTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.script = load_script("generate_embeddings")
+
+    def setUp(self):
+        self.limiter = self.script.RateLimiter(
+            requests_per_minute=60, tokens_per_minute=1000
+        )
+
+    def test_acquire_reserves_estimate_until_settled(self):
+        self.limiter.acquire(300)
+        self.assertAlmostEqual(self.limiter.tokens, 700, delta=1)
+        self.assertAlmostEqual(self.limiter.requests, 59, delta=0.1)
+
+        self.limiter.settle(300, 100)
+        self.assertAlmostEqual(self.limiter.tokens, 900, delta=1)
+
+    def test_oversized_request_only_waits_for_full_bucket(self):
+        self.limiter.acquire(1500)
+
+        self.assertLess(self.limiter.tokens, 0)
+
+    def test_estimate_tokens(self):
+        self.assertEqual(self.script.estimate_tokens(["a" * 40, "b" * 7]), 13)
+
+    def test_embed_documents_charges_actual_usage(self):
+        vo = mock.Mock()
+        vo.embed.return_value = SimpleNamespace(embeddings=[[0.5]], total_tokens=5)
+
+        embeddings = self.script.embed_documents(vo, self.limiter, ["a" * 40])
+
+        self.assertEqual(embeddings, [[0.5]])
+        self.assertAlmostEqual(self.limiter.tokens, 995, delta=1)
+
+    def test_failed_embed_call_refunds_its_reservation(self):
+        vo = mock.Mock()
+        vo.embed.side_effect = ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            self.script.embed_documents(vo, self.limiter, ["a" * 400])
+        self.assertAlmostEqual(self.limiter.tokens, 1000, delta=1)
+
+    def test_drain_empties_the_request_bucket(self):
+        self.limiter.drain()
+
+        self.assertLessEqual(self.limiter.requests, 0)
+
+    def test_rate_limited_call_drains_the_limiter_and_retries(self):
+        limiter = self.script.RateLimiter(
+            requests_per_minute=6000, tokens_per_minute=100000
+        )
+        vo = mock.Mock()
+        vo.embed.side_effect = [
+            self.script.RateLimitError("slow down"),
+            SimpleNamespace(embeddings=[[0.5]], total_tokens=5),
+        ]
+
+        # Skip tenacity's backoff; the limiter itself refills within milliseconds
+        with mock.patch("time.sleep"), mock.patch.object(
+            limiter, "drain", wraps=limiter.drain
+        ) as drain:
+            embeddings = self.script.embed_documents(vo, limiter, ["a" * 40])
+
+        self.assertEqual(embeddings, [[0.5]])
+        self.assertEqual(vo.embed.call_count, 2)
+        drain.assert_called_once()
@@ -1,28 +1,97 @@
+import functools
+import hashlib
 import os
+import struct
 
+import numpy as np
 import voyageai
 from anthropic import Anthropic
+from asgiref.sync import sync_to_async
 from bson import ObjectId
 from bson.errors import InvalidId
+from django.core.cache import cache
+from django.db import connection
 from django.http import Http404
 from django.shortcuts import get_object_or_404, render
 from dotenv import load_dotenv
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
 import json
 
+from .cache_keys import (
+    CUISINES_CACHE_KEY,
+    CUISINES_CACHE_TIMEOUT,
+    RECIPE_STATS_CACHE_KEY,
+    RECIPE_STATS_CACHE_TIMEOUT,
+    TOP_RECIPES_CACHE_KEY,
+    TOP_RECIPES_CACHE_TIMEOUT,
+)
 from .models import Recipe
+from .search import RecipeIndex, embedding_array, title_ngrams
 
 load_dotenv()
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
+# Voyage AI model embedding search queries, and how long query embeddings are
+# kept in Django's cache (shared between workers when REDIS_URL is set)
+QUERY_EMBEDDING_MODEL = "voyage-lite-01-instruct"
+QUERY_EMBEDDING_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Index hinted for the cuisine counts on the statistics page
+CUISINE_INDEX = [("features.cuisine", 1)]
+
+# Relevance/diversity trade-off of the MMR re-ranking, and how many vector
+# search candidates are fetched per returned recipe when re-ranking
+MMR_LAMBDA = 0.6
+MMR_CANDIDATE_FACTOR = 3
+
+# Share of the query's trigrams a title must contain to count as a match, and
+# the number of such matches below which fuzzy_search also queries Atlas Search
+MIN_NGRAM_OVERLAP = 0.5
+MIN_NGRAM_MATCHES = 10
+
+# Shared clients, reused across requests so connection pools and TLS sessions
+# are set up once per process. The API clients are built on first use since
+# they require their API keys at construction.
+
+
+@functools.cache
+def _recipes_collection():
+    """
+    The raw pymongo recipes collection, on a client of its own built from the
+    same DATABASES settings as Django's connection so both read one server
+
+    Django closes its own client at the end of every request (CONN_MAX_AGE is
+    0), which would set up a new pool and TLS session per search.
+    """
+    params = connection.get_connection_params()
+    client = MongoClient(**{"maxPoolSize": 50, **params})
+    return client[connection.settings_dict["NAME"]]["recipes"]
+
+
+@functools.cache
+def _voyage_client():
+    return voyageai.Client()  # Uses VOYAGE_API_KEY from environment
+
+
+@functools.cache
+def _anthropic_client():
+    return Anthropic(api_key=ANTHROPIC_API_KEY)
+
 
 def index(request):
     return render(request, "index.html", {"message": "Recipes App"})
 
 
 def top_recipes(request):
-    recipes = Recipe.objects.all().order_by("title")[:20]
+    # Only the title is listed, so leave the embeddings and instructions behind.
+    # The listing only changes when recipes are written, so it is cached.
+    recipes = cache.get_or_set(
+        TOP_RECIPES_CACHE_KEY,
+        lambda: list(Recipe.objects.only("title").order_by("title")[:20]),
+        TOP_RECIPES_CACHE_TIMEOUT,
+    )
 
     return render(request, "top_recipes.html", {"recipes": recipes})
 
@@ -41,8 +110,12 @@ def recipe_detail(request, recipe_id):
     except InvalidId:
         raise Http404(f"Invalid recipe ID format: {recipe_id}")
 
-    # Get the recipe or return 404
-    recipe = get_object_or_404(Recipe, id=object_id)
+    # Get the recipe or return 404, leaving the embedding data (unused by the
+    # template and by far the largest part of the document) on the server
+    recipe = get_object_or_404(
+        Recipe.objects.defer("voyage_embedding", "embedding_ingredients"),
+        id=object_id,
+    )
 
     # Create context with all needed data
     context = {"recipe": recipe}
@@ -53,13 +126,11 @@ def recipe_detail(request, recipe_id):
 def recipe_statistics(request):
     # Define the aggregation pipeline
     pipeline = [
-        # Stage 1: Extract cuisine from the features subdocument
-        {"$project": {"_id": 1, "cuisine": "$features.cuisine"}},
-        # Stage 2: Group by cuisine and count occurrences
-        {"$group": {"_id": "$cuisine", "count": {"$sum": 1}}},
-        # Stage 3: Sort by count in descending order
+        # Stage 1: Group by cuisine and count occurrences
+        {"$group": {"_id": "$features.cuisine", "count": {"$sum": 1}}},
+        # Stage 2: Sort by count in descending order
         {"$sort": {"count": -1}},
-        # Stage 4: Reshape the output for better readability
+        # Stage 3: Reshape the output for better readability
         {
             "$project": {
                 "_id": 1,
@@ -69,8 +140,19 @@ def recipe_statistics(request):
         },
     ]
 
-    stats = Recipe.objects.raw_aggregate(pipeline)
-    result = list(stats)
+    def aggregate_stats():
+        # Prefer scanning the cuisine index created by create_indexes.py, and
+        # fall back to a plain aggregation where it doesn't exist yet
+        collection = _recipes_collection()
+        try:
+            return list(collection.aggregate(pipeline, hint=CUISINE_INDEX))
+        except OperationFailure:
+            return list(collection.aggregate(pipeline))
+
+    # The cuisine mix changes slowly, so serve it from the cache for a while
+    result = cache.get_or_set(
+        RECIPE_STATS_CACHE_KEY, aggregate_stats, RECIPE_STATS_CACHE_TIMEOUT
+    )
 
     return render(
         request,
@@ -79,58 +161,155 @@ def recipe_statistics(request):
     )
 
 
-def perform_vector_search(query_text, limit=10, num_candidates=None):
+@functools.lru_cache(maxsize=2048)
+def _embed_query(query_text):
+    """
+    Embed a search query with Voyage AI, caching the vector per process and
+    in Django's cache (packed as float32 bytes) so repeated queries skip the
+    API call
+
+    Args:
+        query_text (str): Text to embed
+
+    Returns:
+        tuple: The query embedding
+    """
+    # Keyed on the model too, so changing it never serves stale vectors
+    digest = hashlib.sha1(query_text.encode()).hexdigest()
+    cache_key = f"vemb:{QUERY_EMBEDDING_MODEL}:{digest}"
+
+    def embed():
+        embedding = _voyage_client().embed(
+            [query_text], model=QUERY_EMBEDDING_MODEL, input_type="query"
+        ).embeddings[0]
+        return struct.pack(f"<{len(embedding)}f", *embedding)
+
+    packed = cache.get_or_set(cache_key, embed, QUERY_EMBEDDING_CACHE_TIMEOUT)
+    return struct.unpack(f"<{len(packed) // 4}f", packed)
+
+
+def mmr_rerank(query_embedding, embeddings, k, lambda_mult=MMR_LAMBDA):
+    """
+    Select `k` results by Maximal Marginal Relevance, trading similarity to
+    the query against similarity to the results already selected
+
+    Args:
+        query_embedding (list): Embedding of the search query
+        embeddings (list): Embeddings of the candidate results
+        k (int): Number of results to select
+        lambda_mult (float): 1 ranks purely by relevance, 0 purely by diversity
+
+    Returns:
+        list: Indices of the selected candidates, in selection order
+    """
+    candidates = np.vstack(embeddings)
+    candidates = candidates / np.linalg.norm(candidates, axis=1, keepdims=True)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / np.linalg.norm(query)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    while len(selected) < min(k, len(candidates)):
+        redundancy = similarity[:, selected].max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
+
+def perform_vector_search(
+    query_text, limit=10, num_candidates=None, filter=None, diversify=False
+):
+    """
+    Find the recipes closest to `query_text`, using the in-process
+    RecipeIndex when enabled and Atlas Vector Search otherwise
+
+    Args:
+        query_text (str): Text to embed and search for
+        limit (int): Maximum number of recipes to return
+        num_candidates (int): Nearest neighbours considered, defaults to three
+            times the number of recipes fetched
+        filter (dict): Optional pre-filter on indexed filter fields, e.g.
+            {"features.cuisine": "Italian"}, applied during graph traversal.
+            Filtered searches always go through Atlas Vector Search
+        diversify (bool): Re-rank a larger candidate set with MMR so the
+            results are less redundant
+
+    Returns:
+        list: Recipe dicts ordered by similarity (or by MMR when diversified)
+    """
+    fetch_limit = limit * MMR_CANDIDATE_FACTOR if diversify else limit
     if num_candidates is None:
-        num_candidates = limit * 3
+        num_candidates = fetch_limit * 3
 
     try:
-        # Generate embedding for the search query
-        vo = voyageai.Client()  # Uses VOYAGE_API_KEY from environment
-        query_embedding = vo.embed(
-            [query_text], model="voyage-lite-01-instruct", input_type="query"
-        ).embeddings[0]
+        # Generate (or reuse the cached) embedding for the search query
+        query_embedding = list(_embed_query(query_text))
+
+        vector_search = {
+            "index": "recipe_vector_index",
+            "path": "voyage_embedding",
+            "queryVector": query_embedding,
+            "numCandidates": num_candidates,
+            "limit": fetch_limit,
+        }
+        if filter:
+            vector_search["filter"] = filter
+
+        # Query MongoDB directly: the results are only displayed, so there is
+        # no need to materialize model instances for them
+        collection = _recipes_collection()
+        fields = {
+            "_id": 1,
+            "title": 1,
+            "ingredients": 1,
+            "instructions": 1,
+            "features": 1,
+        }
+
+        recipe_index = None if filter else RecipeIndex.get(collection)
+
+        if recipe_index is not None:
+            # Score every recipe in-process, then load only the ones returned
+            hits = recipe_index.search(query_embedding, fetch_limit)
+            docs_by_id = {
+                doc["_id"]: doc
+                for doc in collection.find(
+                    {"_id": {"$in": [recipe_id for recipe_id, _, _ in hits]}}, fields
+                )
+            }
+            results = []
+            for recipe_id, score, embedding in hits:
+                if recipe_id in docs_by_id:
+                    doc = {**docs_by_id[recipe_id], "score": score}
+                    # MMR needs the candidate embeddings, as in the Atlas branch
+                    if diversify:
+                        doc["voyage_embedding"] = embedding
+                    results.append(doc)
+        else:
+            projection = {**fields, "score": {"$meta": "vectorSearchScore"}}
+            # MMR needs the candidate embeddings to compare them with each other
+            if diversify:
+                projection["voyage_embedding"] = 1
+
+            results = collection.aggregate(
+                [{"$vectorSearch": vector_search}, {"$project": projection}]
+            )
+
+        # Rename the MongoDB fields to the keys the templates use in one pass
+        recipes = [
+            {"id": str(doc.pop("_id")), "similarity_score": doc.pop("score", 0), **doc}
+            for doc in results
+        ]
 
-        # Use Django's raw_aggregate to perform vector search
-        results = Recipe.objects.raw_aggregate(
-            [
-                {
-                    "$vectorSearch": {
-                        "index": "recipe_vector_index",
-                        "path": "voyage_embedding",
-                        "queryVector": query_embedding,
-                        "numCandidates": num_candidates,
-                        "limit": limit,
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 1,
-                        "title": 1,
-                        "ingredients": 1,
-                        "instructions": 1,
-                        "features": 1,
-                        "score": {"$meta": "vectorSearchScore"},
-                    }
-                },
+        if diversify and recipes:
+            embeddings = [
+                embedding_array(recipe.pop("voyage_embedding")) for recipe in recipes
             ]
-        )
-
-        # Format the results - accessing attributes directly
-        recipes = []
-        for recipe in results:
-            try:
-                # Try direct attribute access first
-                recipe_dict = {
-                    "id": str(recipe.id),
-                    "title": recipe.title,
-                    "ingredients": recipe.ingredients,
-                    "instructions": getattr(recipe, "instructions", ""),
-                    "features": getattr(recipe, "features", {}),
-                    "similarity_score": getattr(recipe, "score", 0),
-                }
-                recipes.append(recipe_dict)
-            except Exception as e:
-                print(f"Error formatting recipe: {str(e)}")
+            selected = mmr_rerank(query_embedding, embeddings, limit)
+            recipes = [recipes[i] for i in selected]
         return recipes
 
     except Exception as e:
@@ -138,18 +317,56 @@ def perform_vector_search(query_text, limit=10, num_candidates=None):
         return []
 
 
+def known_cuisines():
+    """
+    List the cuisines recipes are tagged with, offered as the choices of the
+    cuisine filter so it only ever receives values the exact-match
+    $vectorSearch pre-filter can match
+    """
+
+    def distinct_cuisines():
+        collection = _recipes_collection()
+        return sorted(
+            cuisine
+            for cuisine in collection.distinct("features.cuisine")
+            if isinstance(cuisine, str) and cuisine
+        )
+
+    # The filter is optional, so a database error only leaves it without choices
+    try:
+        return cache.get_or_set(
+            CUISINES_CACHE_KEY, distinct_cuisines, CUISINES_CACHE_TIMEOUT
+        )
+    except PyMongoError as e:
+        print(f"Error listing cuisines: {str(e)}")
+        return []
+
+
+def cuisine_filter(cuisine):
+    """Build a $vectorSearch pre-filter restricting results to one cuisine"""
+    return {"features.cuisine": cuisine} if cuisine else None
+
+
 def ingredient_vector_search(request):
     """
     View for searching recipes by ingredients using vector search
     """
     query = request.GET.get("query", "")
+    cuisine = request.GET.get("cuisine", "")
     results = []
 
     if query:
         ingredient_query = f"Ingredients: {query}"
-        results = perform_vector_search(ingredient_query, limit=10)
+        results = perform_vector_search(
+            ingredient_query, limit=10, filter=cuisine_filter(cuisine)
+        )
 
-    context = {"query": query, "results": results}
+    context = {
+        "query": query,
+        "cuisine": cuisine,
+        "cuisines": known_cuisines(),
+        "results": results,
+    }
     return render(request, "vector_search.html", context)
 
 
@@ -158,84 +375,171 @@ def fuzzy_search(request):
     Simple function-based view for fuzzy search using MongoDB Atlas Search
     """
     query = request.GET.get("q", "")
-    recipes = []
+    results = []
 
     if query:
-        # Get MongoDB connection details from environment variables
-        MONGO_URI = os.getenv(
-            "MONGO_URI", "mongodb://localhost:12404/?directConnection=true"
-        )
-        MONGO_DB = os.getenv("MONGO_DB", "cookbook")
+        # Query MongoDB directly for Atlas Search
+        collection = _recipes_collection()
+
+        # Fields rendered for every search hit
+        projection = {
+            "_id": 1,
+            "title": 1,
+            "ingredients": 1,
+            "instructions": 1,
+            "features": 1,
+        }
+
+        # Try the indexed title trigrams first: the multikey index narrows the
+        # candidates, which only count as matches when they share at least
+        # MIN_NGRAM_OVERLAP of the query's trigrams
+        search_results = []
+        query_grams = title_ngrams(query)
+        if query_grams:
+            ngram_pipeline = [
+                {"$match": {"title_ngrams": {"$in": query_grams}}},
+                {
+                    "$project": {
+                        **projection,
+                        "score": {
+                            "$divide": [
+                                {
+                                    "$size": {
+                                        "$setIntersection": [
+                                            "$title_ngrams",
+                                            query_grams,
+                                        ]
+                                    }
+                                },
+                                len(query_grams),
+                            ]
+                        },
+                    }
+                },
+                {"$match": {"score": {"$gte": MIN_NGRAM_OVERLAP}}},
+                {"$sort": {"score": -1}},
+                {"$limit": 50},
+            ]
+            search_results = list(collection.aggregate(ngram_pipeline))
+
+        # Use the Atlas fuzzy search pipeline when too few titles match
+        if len(search_results) < MIN_NGRAM_MATCHES:
+            pipeline = [
+                {
+                    "$search": {
+                        "index": "default",  # Use the default index
+                        "compound": {
+                            "should": [
+                                # Prefix-heavy fields use the edge-ngram
+                                # autocomplete mapping from create_indexes.py
+                                {
+                                    "autocomplete": {
+                                        "query": query,
+                                        "path": "title",
+                                        "fuzzy": {"maxEdits": 1, "prefixLength": 2},
+                                        "score": {"boost": {"value": 5}},
+                                    }
+                                },
+                                {
+                                    "autocomplete": {
+                                        "query": query,
+                                        "path": "ingredients",
+                                        "fuzzy": {"maxEdits": 1, "prefixLength": 1},
+                                        "score": {"boost": {"value": 3}},
+                                    }
+                                },
+                                {
+                                    "text": {
+                                        "query": query,
+                                        "path": "instructions",
+                                        "fuzzy": {"maxEdits": 2, "prefixLength": 1},
+                                    }
+                                },
+                            ]
+                        },
+                        # Let the search index order by relevance instead of
+                        # sorting in a later aggregation stage
+                        "sort": {"score": {"$meta": "searchScore"}},
+                    }
+                },
+                {"$project": {**projection, "score": {"$meta": "searchScore"}}},
+                {"$limit": 50},  # Limit results
+            ]
 
-        # Connect to MongoDB directly for Atlas Search
-        client = MongoClient(MONGO_URI)
-        db = client[MONGO_DB]
-        collection = db["recipes"]
+            # Atlas ranks title, ingredient and instruction matches together, so
+            # its hits lead and the remaining title matches follow
+            title_matches = search_results
+            search_results = list(collection.aggregate(pipeline))
+            seen_ids = {result["_id"] for result in search_results}
+            search_results += [
+                result for result in title_matches if result["_id"] not in seen_ids
+            ]
+            search_results = search_results[:50]
 
-        # Build the fuzzy search pipeline
-        pipeline = [
-            {
-                "$search": {
-                    "index": "default",  # Use the default index
-                    "compound": {
-                        "should": [
-                            {
-                                "text": {
-                                    "query": query,
-                                    "path": "title",
-                                    "fuzzy": {"maxEdits": 2, "prefixLength": 2},
-                                    "score": {"boost": {"value": 5}},
-                                }
-                            },
-                            {
-                                "text": {
-                                    "query": query,
-                                    "path": "ingredients",
-                                    "fuzzy": {"maxEdits": 2, "prefixLength": 1},
-                                    "score": {"boost": {"value": 3}},
-                                }
-                            },
-                            {
-                                "text": {
-                                    "query": query,
-                                    "path": "instructions",
-                                    "fuzzy": {"maxEdits": 2, "prefixLength": 1},
-                                }
-                            },
-                        ]
-                    },
-                }
-            },
+        # The projection already holds every field fuzzy_search.html displays,
+        # so the results are rendered without re-fetching the recipes
+        results = [
             {
-                "$project": {
-                    "_id": 1,
-                    "title": 1,
-                    "ingredients": 1,
-                    "instructions": 1,
-                    "features": 1,
-                    "score": {"$meta": "searchScore"},
-                }
-            },
-            {"$sort": {"score": -1}},
-            {"$limit": 50},  # Limit results
+                "id": str(result["_id"]),
+                "title": result["title"],
+                "ingredients": result.get("ingredients", []),
+                "instructions": result.get("instructions", ""),
+                "features": result.get("features", {}),
+                "score": result["score"],
+            }
+            for result in search_results
         ]
 
-        # Execute the search
-        search_results = list(collection.aggregate(pipeline))
-
-        # Extract IDs from search results
-        recipe_ids = [result["_id"] for result in search_results]
-
-        # Get Django model instances and preserve ordering
-        id_to_position = {str(id): idx for idx, id in enumerate(recipe_ids)}
-        recipes_unordered = Recipe.objects.filter(id__in=recipe_ids)
-
-        # Convert to list and sort by search score order
-        recipes = list(recipes_unordered)
-        recipes.sort(key=lambda r: id_to_position.get(str(r.id), 999))
-
     # Render the template with results
-    return render(request, "vector_search.html", {"recipes": recipes, "query": query})
+    return render(request, "fuzzy_search.html", {"results": results, "query": query})
+
+
+# Tool Claude is required to call, so the suggestions come back as structured
+# data rather than free text that has to be split apart
+MEAL_SUGGESTIONS_TOOL = {
+    "name": "record_meal_suggestions",
+    "description": "Record meal suggestions for the ingredients the user has.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "suggestions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string", "description": "Recipe name"},
+                        "ingredients_used": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Ingredients the user has that are used",
+                        },
+                        "substitutions": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Substitutions for missing ingredients",
+                        },
+                        "preparation": {
+                            "type": "string",
+                            "description": "Brief description of how to prepare it",
+                        },
+                        "difficulty": {
+                            "type": "string",
+                            "enum": ["easy", "medium", "hard"],
+                        },
+                    },
+                    "required": [
+                        "name",
+                        "ingredients_used",
+                        "substitutions",
+                        "preparation",
+                        "difficulty",
+                    ],
+                },
+            }
+        },
+        "required": ["suggestions"],
+    },
+}
 
 
 def get_claude_suggestions(user_ingredients, similar_recipes, max_suggestions=4):
@@ -248,10 +552,9 @@ def get_claude_suggestions(user_ingredients, similar_recipes, max_suggestions=4)
         max_suggestions (int): Maximum number of suggestions to return
 
     Returns:
-        list: List of meal suggestions from Claude
+        list: Suggestion dicts with name, ingredients_used, substitutions,
+            preparation and difficulty keys
     """
-    client = Anthropic(api_key=ANTHROPIC_API_KEY)
-
     # Prepare the prompt for Claude
     prompt = f"""I have these ingredients: {", ".join(user_ingredients)}
 
@@ -261,58 +564,48 @@ Here are some similar recipes from my database that might help you:
 
     {json.dumps(similar_recipes, indent=2)}
 
-For each suggestion, please:
-1. Provide a recipe name
-2. List the ingredients I have that can be used
-3. Suggest substitutions for any missing ingredients
-4. Give a brief description of how to prepare it
-5. Mention difficulty level (easy, medium, hard)
+For each suggestion, please provide a recipe name, the ingredients I have that
+can be used, substitutions for any missing ingredients, a brief description of
+how to prepare it, and its difficulty level (easy, medium, hard).
 
 Be friendly, practical, and focus on using what I have available with minimal extra ingredients. 
-Keep your answer concise and focused on the meal suggestions.
+Keep your answer concise and focused on the meal suggestions, and record them
+with the record_meal_suggestions tool.
 """
 
-    # Call Claude API
-    response = client.messages.create(
+    # Call Claude API, forcing the structured suggestions tool
+    response = _anthropic_client().messages.create(
         model="claude-3-haiku-20240307",
         max_tokens=1500,
         temperature=0.7,
         system="You are a helpful cooking assistant that provides meal suggestions based on available ingredients.",
         messages=[{"role": "user", "content": prompt}],
+        tools=[MEAL_SUGGESTIONS_TOOL],
+        tool_choice={"type": "tool", "name": MEAL_SUGGESTIONS_TOOL["name"]},
     )
 
-    # Extract and parse suggestions
-    suggestions_text = response.content[0].text
-
-    # Split the suggestions - we'll assume each suggestion starts with a recipe name and number
-    raw_suggestions = []
-    current_suggestion = ""
-
-    for line in suggestions_text.split("\n"):
-        # Check if this line starts a new suggestion
-        if line.strip() and (
-            line.strip()[0].isdigit() and line.strip()[1:3] in [". ", ") "]
-        ):
-            if current_suggestion:
-                raw_suggestions.append(current_suggestion.strip())
-            current_suggestion = line
-        else:
-            current_suggestion += "\n" + line
-
-    # Add the last suggestion
-    if current_suggestion:
-        raw_suggestions.append(current_suggestion.strip())
+    # The tool input is already parsed into the suggestion objects
+    for block in response.content:
+        if block.type == "tool_use":
+            suggestions = block.input.get("suggestions", [])
+            # Limit to max_suggestions
+            return suggestions[:max_suggestions]
 
-    # Limit to max_suggestions
-    return raw_suggestions[:max_suggestions]
+    return []
 
 
-def ai_meal_suggestions(request):
+async def ai_meal_suggestions(request):
     """
     View that combines vector search with Claude AI to suggest meals
     based on user-provided ingredients
+
+    The Voyage and Claude HTTP calls run in worker threads of their own, so
+    under ASGI the event loop keeps serving other requests meanwhile. The
+    database work stays thread-sensitive, on the thread Django manages its
+    connections on.
     """
     query = request.GET.get("ingredients", "")
+    cuisine = request.GET.get("cuisine", "")
     suggestions = []
     error_message = None
 
@@ -322,9 +615,19 @@ def ai_meal_suggestions(request):
             ingredients_list = [ing.strip() for ing in query.split(",") if ing.strip()]
             ingredients_text = ", ".join(ingredients_list)
 
-            # Perform vector search to find similar recipes
+            # Embed the query up front, so the vector search below finds it in
+            # the embedding cache and only queries MongoDB
             search_query = f"Ingredients: {ingredients_text}"
-            similar_recipes = perform_vector_search(search_query, limit=10)
+            await sync_to_async(_embed_query, thread_sensitive=False)(search_query)
+
+            # Perform vector search to find similar recipes, diversifying the
+            # hits so Claude isn't shown near-duplicate recipes
+            similar_recipes = await sync_to_async(perform_vector_search)(
+                search_query,
+                limit=10,
+                filter=cuisine_filter(cuisine),
+                diversify=True,
+            )
 
             if similar_recipes:
                 # Format recipe data for Claude
@@ -340,7 +643,9 @@ def ai_meal_suggestions(request):
                     )
 
                 # Call Claude API for meal suggestions
-                suggestions = get_claude_suggestions(ingredients_list, recipes_data)
+                suggestions = await sync_to_async(
+                    get_claude_suggestions, thread_sensitive=False
+                )(ingredients_list, recipes_data)
             else:
                 error_message = "No similar recipes found for the provided ingredients."
 
@@ -349,6 +654,8 @@ def ai_meal_suggestions(request):
 
     context = {
         "ingredients": query,
+        "cuisine": cuisine,
+        "cuisines": await sync_to_async(known_cuisines)(),
         "suggestions": suggestions,
         "error_message": error_message,
     }
@@ -0,0 +1,118 @@
+import os
+import sys
+
+import pymongo
+from dotenv import load_dotenv
+from pymongo.operations import SearchIndexModel
+
+# Share the title trigram helper with the Django app in cookbook/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "cookbook"))
+from recipes.search import title_ngrams  # noqa: E402
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:12404/?directConnection=true")
+MONGO_DB = os.getenv("MONGO_DB", "cookbook")
+
+# Edge-ngram mapping used for prefix matches typed into the fuzzy search
+AUTOCOMPLETE_FIELD = {
+    "type": "autocomplete",
+    "tokenization": "edgeGram",
+    "foldDiacritics": True,
+    "minGrams": 2,
+    "maxGrams": 15,
+}
+
+# Atlas Search indexes used by the recipes views, keyed by index name
+SEARCH_INDEXES = {
+    "default": {
+        "type": "search",
+        "definition": {
+            "mappings": {
+                "dynamic": False,
+                "fields": {
+                    "title": [{"type": "string"}, AUTOCOMPLETE_FIELD],
+                    "ingredients": [{"type": "string"}, AUTOCOMPLETE_FIELD],
+                    "instructions": {"type": "string"},
+                },
+            }
+        },
+    },
+    "recipe_vector_index": {
+        "type": "vectorSearch",
+        "definition": {
+            "fields": [
+                {
+                    # voyage-lite-01-instruct embeddings, stored as float32
+                    # vectors and scalar-quantized to int8 in the index
+                    "type": "vector",
+                    "path": "voyage_embedding",
+                    "numDimensions": 1024,
+                    "similarity": "cosine",
+                    "quantization": "scalar",
+                },
+                # Fields usable as $vectorSearch pre-filters
+                {"type": "filter", "path": "features.cuisine"},
+                {"type": "filter", "path": "features.complexity"},
+            ]
+        },
+    },
+}
+
+# Regular indexes on the recipes collection
+INDEXES = [
+    # Multikey index serving the trigram title matches in fuzzy_search
+    [("title_ngrams", pymongo.ASCENDING)],
+    # Hinted by the cuisine counts on the statistics page
+    [("features.cuisine", pymongo.ASCENDING)],
+]
+
+try:
+    # Connect to MongoDB
+    client = pymongo.MongoClient(MONGO_URI)
+    db = client[MONGO_DB]
+    collection = db["recipes"]
+
+    # Backfill title trigrams on recipes imported before they were precomputed
+    missing_ngrams = collection.find(
+        {"title_ngrams": {"$exists": False}, "title": {"$type": "string"}},
+        projection={"_id": 1, "title": 1},
+    )
+    operations = [
+        pymongo.UpdateOne(
+            {"_id": doc["_id"]}, {"$set": {"title_ngrams": title_ngrams(doc["title"])}}
+        )
+        for doc in missing_ngrams
+    ]
+    if operations:
+        result = collection.bulk_write(operations, ordered=False)
+        print(f"Added title_ngrams to {result.modified_count} recipes")
+
+    for keys in INDEXES:
+        name = collection.create_index(keys)
+        print(f"Ensured index '{name}'")
+
+    # Search indexes need Atlas (or a local Atlas deployment); failing to create
+    # them leaves the regular indexes above in place
+    try:
+        existing_indexes = {index["name"] for index in collection.list_search_indexes()}
+
+        # Create missing search indexes and bring existing ones up to date
+        for name, index in SEARCH_INDEXES.items():
+            if name in existing_indexes:
+                collection.update_search_index(name, index["definition"])
+                print(f"Updated search index '{name}'")
+            else:
+                collection.create_search_index(
+                    SearchIndexModel(
+                        definition=index["definition"], name=name, type=index["type"]
+                    )
+                )
+                print(f"Created search index '{name}'")
+    except pymongo.errors.OperationFailure as e:
+        print(f"Error creating search indexes: {e}")
+
+except pymongo.errors.ConnectionFailure as e:
+    print(f"Error connecting to MongoDB: {e}")
+except Exception as e:
+    print(f"Error creating indexes: {e}")
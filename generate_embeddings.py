@@ -1,68 +1,272 @@
+import itertools
 import os
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 
 import pymongo
 import voyageai
+from bson.binary import Binary, BinaryVectorDtype
 from dotenv import load_dotenv
+from tenacity import (
+    Retrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 from tqdm import tqdm
+from voyageai.error import RateLimitError
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:12404/?directConnection=true")
 MONGO_DB = os.getenv("MONGO_DB", "cookbook")
 
+# Voyage AI quotas for the account in use. The defaults match the free tier
+# (3 requests / 10K tokens per minute); raise them for paid tiers.
+VOYAGE_RPM = int(os.getenv("VOYAGE_RPM", "3"))
+VOYAGE_TPM = int(os.getenv("VOYAGE_TPM", "10000"))
 
-# MongoDB connection
-try:
-    # Connect to MongoDB
-    client = pymongo.MongoClient(MONGO_URI)
-    db = client[MONGO_DB]
-    collection = db["recipes"]
+# Number of documents sent to Voyage AI in a single embed call
+BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "128"))
+# Number of embed calls kept in flight at once
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "8"))
+MAX_RETRIES = 5
 
-    # Initialize Voyage AI client
-    # This automatically uses the VOYAGE_API_KEY environment variable
-    vo = voyageai.Client()
 
-    # Find documents without voyage_embedding
-    query = {"voyage_embedding": {"$exists": False}}
-    documents_without_embeddings = list(collection.find(query))
+class RateLimiter:
+    """
+    Thread-safe token bucket keeping embed calls under the Voyage AI
+    requests-per-minute and tokens-per-minute quotas
+    """
 
-    print(
-        f"Found {len(documents_without_embeddings)} documents without Voyage embeddings"
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.request_capacity = requests_per_minute
+        self.token_capacity = tokens_per_minute
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed_minutes = (now - self.last_refill) / 60
+        self.last_refill = now
+        self.requests = min(
+            self.request_capacity,
+            self.requests + elapsed_minutes * self.request_capacity,
+        )
+        self.tokens = min(
+            self.token_capacity, self.tokens + elapsed_minutes * self.token_capacity
+        )
+
+    def acquire(self, tokens):
+        """
+        Block until a request of an estimated number of tokens can be sent
+        without exceeding either quota, and reserve that budget for it
+
+        Reserving up front keeps concurrent workers from all passing on the
+        same positive balance and overshooting the tokens-per-minute quota.
+        """
+        # A request larger than the whole bucket only waits for a full bucket
+        needed = min(tokens, self.token_capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.requests >= 1 and self.tokens >= needed:
+                    self.requests -= 1
+                    self.tokens -= tokens
+                    return
+                # Sleep just long enough for the emptier bucket to refill
+                wait_requests = (1 - self.requests) * 60 / self.request_capacity
+                wait_tokens = (needed - self.tokens) * 60 / self.token_capacity
+            time.sleep(max(wait_requests, wait_tokens, 0.01))
+
+    def settle(self, reserved, used):
+        """
+        Replace a reservation made by `acquire()` with the tokens the request
+        actually used (0 when it failed)
+        """
+        with self.lock:
+            self.tokens += reserved - used
+
+    def drain(self):
+        """
+        Empty the request bucket after a 429, so every worker waits for it to
+        refill rather than sending more requests that would be rejected
+        """
+        with self.lock:
+            self.requests = min(self.requests, 0.0)
+
+
+def chunked(iterable, size):
+    """Yield successive lists of up to `size` items from `iterable`"""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def estimate_tokens(contents):
+    """Rough token count of a batch, at about four characters per token"""
+    return sum(len(content) // 4 + 1 for content in contents)
+
+
+def pack_embedding(embedding):
+    """Pack an embedding as a BSON float32 vector (binData subtype 9)"""
+    return Binary.from_vector(embedding, BinaryVectorDtype.FLOAT32)
+
+
+def embed_documents(vo, limiter, contents):
+    """
+    Embed a batch of documents at the rate the limiter allows, backing off
+    with jittered exponential waits only when Voyage AI returns a 429
+    """
+    retrying = Retrying(
+        retry=retry_if_exception_type(RateLimitError),
+        wait=wait_exponential_jitter(initial=1, max=30),
+        stop=stop_after_attempt(MAX_RETRIES),
+        before_sleep=lambda retry_state: limiter.drain(),
+        reraise=True,
     )
+    estimated_tokens = estimate_tokens(contents)
+    for attempt in retrying:
+        with attempt:
+            limiter.acquire(estimated_tokens)
+            try:
+                embedding_result = vo.embed(
+                    contents,
+                    model="voyage-lite-01-instruct",
+                    input_type="document",
+                )
+            except Exception:
+                limiter.settle(estimated_tokens, 0)
+                raise
+
+    limiter.settle(estimated_tokens, embedding_result.total_tokens)
+    return embedding_result.embeddings
+
+
+def embed_and_write(collection, vo, limiter, batch):
+    """
+    Embed a batch of recipes and store the embeddings, returning the number of
+    documents updated
+    """
+    # Prepare content for embedding - just the title and the ingredients
+    contents = [
+        f"{doc['title']}. Ingredients: {doc['embedding_ingredients']}" for doc in batch
+    ]
 
-    # Add embeddings to documents that don't have them
-    for doc in tqdm(documents_without_embeddings, desc="Adding embeddings"):
-        # Prepare content for embedding - just the title and the ingredients
-        content_to_embed = (
-            f"{doc['title']}. Ingredients: {doc['embedding_ingredients']}"
+    # Get embeddings from Voyage AI for the whole batch in one call
+    embeddings = embed_documents(vo, limiter, contents)
+
+    # Update all documents of the batch in a single round-trip
+    operations = [
+        pymongo.UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"voyage_embedding": pack_embedding(embedding)}},
         )
+        for doc, embedding in zip(batch, embeddings)
+    ]
+    return collection.bulk_write(operations, ordered=False).modified_count
+
 
-        # Get embedding from Voyage AI
+def collect_results(futures, pending, progress):
+    """Tally finished batches, reporting the ones that failed"""
+    embedded_count = 0
+    for future in futures:
+        batch = pending.pop(future)
         try:
-            embedding_result = vo.embed(
-                [content_to_embed],
-                model="voyage-lite-01-instruct",
-                input_type="document",
+            embedded_count += future.result()
+        except Exception as e:
+            print(
+                f"Error generating embeddings for {len(batch)} recipes "
+                f"starting at '{batch[0]['title']}': {e}"
             )
-            embedding = embedding_result.embeddings[0]
+        progress.update(len(batch))
+    return embedded_count
 
-            # Update document with embedding
-            collection.update_one(
-                {"_id": doc["_id"]}, {"$set": {"voyage_embedding": embedding}}
-            )
 
-            # Add a small delay to avoid hitting rate limits
-            time.sleep(25)
+def main():
+    # MongoDB connection
+    try:
+        # Connect to MongoDB
+        client = pymongo.MongoClient(MONGO_URI)
+        db = client[MONGO_DB]
+        collection = db["recipes"]
 
-        except Exception as e:
-            print(f"Error generating embedding for recipe '{doc['title']}': {e}")
+        # Initialize Voyage AI client
+        # This automatically uses the VOYAGE_API_KEY environment variable
+        vo = voyageai.Client()
+        limiter = RateLimiter(VOYAGE_RPM, VOYAGE_TPM)
+
+        # Find documents without voyage_embedding. The cursor is consumed lazily,
+        # decoding only the fields needed for the embedding one batch at a time
+        query = {"voyage_embedding": {"$exists": False}}
+        total_documents = collection.count_documents(query)
+        documents_without_embeddings = collection.find(
+            query,
+            projection={"_id": 1, "title": 1, "embedding_ingredients": 1},
+            batch_size=BATCH_SIZE,
+        )
+
+        print(f"Found {total_documents} documents without Voyage embeddings")
+
+        # Add embeddings to documents that don't have them, several batches at a
+        # time. Only a bounded number of batches is read ahead of the workers so
+        # the cursor is still consumed lazily.
+        embedded_count = 0
+        pending = {}
+        with tqdm(total=total_documents, desc="Adding embeddings") as progress:
+            with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+                for batch in chunked(documents_without_embeddings, BATCH_SIZE):
+                    future = executor.submit(
+                        embed_and_write, collection, vo, limiter, batch
+                    )
+                    pending[future] = batch
+
+                    if len(pending) >= EMBEDDING_WORKERS * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        embedded_count += collect_results(done, pending, progress)
+
+                embedded_count += collect_results(
+                    as_completed(list(pending)), pending, progress
+                )
+
+        print(f"Successfully added embeddings to {embedded_count} documents")
+
+        # Convert embeddings stored as JSON arrays by earlier runs into packed
+        # float32 vectors, which take a fraction of the space on disk and in RAM
+        legacy_query = {"voyage_embedding": {"$type": "array"}}
+        legacy_documents = collection.find(
+            legacy_query,
+            projection={"_id": 1, "voyage_embedding": 1},
+            batch_size=BATCH_SIZE,
+        )
+
+        converted_count = 0
+        for batch in chunked(legacy_documents, BATCH_SIZE):
+            operations = [
+                pymongo.UpdateOne(
+                    {"_id": doc["_id"]},
+                    {
+                        "$set": {
+                            "voyage_embedding": pack_embedding(doc["voyage_embedding"])
+                        }
+                    },
+                )
+                for doc in batch
+            ]
+            result = collection.bulk_write(operations, ordered=False)
+            converted_count += result.modified_count
+
+        if converted_count:
+            print(f"Converted {converted_count} array embeddings to float32 vectors")
+
+    except pymongo.errors.ConnectionFailure as e:
+        print(f"Error connecting to MongoDB: {e}")
+    except Exception as e:
+        print(f"Error processing documents: {e}")
 
-    print(
-        f"Successfully added embeddings to {len(documents_without_embeddings)} documents"
-    )
 
-except pymongo.errors.ConnectionFailure as e:
-    print(f"Error connecting to MongoDB: {e}")
-except Exception as e:
-    print(f"Error processing documents: {e}")
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
+import itertools
 import os
+import sys
 import pymongo
-import json
+import ijson
 from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError
+from tqdm import tqdm
+
+# Share the title trigram helper with the Django app in cookbook/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "cookbook"))
+from recipes.search import title_ngrams  # noqa: E402
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,41 +19,81 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:12404/?directConnection=true")
 MONGO_DB = os.getenv("MONGO_DB", "cookbook")
 
-try:
-    # Establish connection to MongoDB
-    client = pymongo.MongoClient(MONGO_URI)
-    db = client[MONGO_DB]
-    print(db)
-    
-    # Open and load the JSON file containing recipe data
-    with open("bigger_sample.json", "r") as f:
-        recipes_data = json.load(f)
-    
-    # Iterate through each recipe in the loaded data
-    for recipe in recipes_data:
+# Number of recipes sent to MongoDB per insert_many call
+BATCH_SIZE = 1000
+
+
+def recipe_documents(recipes):
+    """
+    Create a document with selected fields from each recipe, reporting and
+    skipping recipes that are missing fields
+    """
+    for recipe in recipes:
         try:
-            # Create a document with selected fields from the recipe
             recipe_doc = {
                 "title": recipe["title"],
+                "title_ngrams": title_ngrams(recipe["title"]),
                 "ingredients": recipe["ingredients"],
                 "instructions": recipe["instructions"],
                 "embedding_ingredients": recipe["embedding_ingredients"],
                 "features": recipe["features"],
             }
-            print(recipe_doc)
-            
-            # Insert the recipe document into the 'recipes' collection
-            db.recipes.insert_one(recipe_doc)
-        except Exception as e:
-            # Handle errors for individual recipe insertion
-            print(f"Error inserting recipe: {e}")
-    
+        except (KeyError, TypeError) as e:
+            # Handle errors for individual recipes
+            tqdm.write(f"Error inserting recipe: {e!r}")
+            continue
+        yield recipe_doc
+
+
+def chunked(iterable, size):
+    """Yield successive lists of up to `size` items from `iterable`"""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+try:
+    # Establish connection to MongoDB
+    client = pymongo.MongoClient(MONGO_URI)
+    db = client[MONGO_DB]
+    print(db)
+
+    # Prefer the C-accelerated yajl2 parser when it is available
+    try:
+        json_parser = ijson.get_backend("yajl2_c")
+    except ImportError:
+        json_parser = ijson
+
+    # Open the JSON file and stream the recipes out of its top-level array
+    with open("bigger_sample.json", "rb") as f:
+        recipes_data = json_parser.items(f, "item", use_float=True)
+
+        recipe_docs = recipe_documents(recipes_data)
+
+        # Insert the recipe documents into the 'recipes' collection in batches,
+        # reporting progress once per batch rather than once per recipe
+        inserted_count = 0
+        with tqdm(desc="Importing recipes", unit=" recipes") as progress:
+            for batch in chunked(recipe_docs, BATCH_SIZE):
+                try:
+                    result = db.recipes.insert_many(batch, ordered=False)
+                    inserted_count += len(result.inserted_ids)
+                except BulkWriteError as bwe:
+                    # Unordered inserts keep going past failures; report only those
+                    inserted_count += bwe.details["nInserted"]
+                    for error in bwe.details["writeErrors"]:
+                        title = batch[error["index"]]["title"]
+                        tqdm.write(
+                            f"Error inserting recipe '{title}': {error['errmsg']}"
+                        )
+                progress.update(len(batch))
+
     # Print success message with count of inserted recipes
-    print(f"Inserted {len(recipes_data)} recipes into MongoDB")
+    print(f"Inserted {inserted_count} recipes into MongoDB")
 
 except pymongo.errors.ConnectionFailure as e:
     # Handle MongoDB connection failures
     print(f"Error connecting to MongoDB: {e}")
 except Exception as e:
     # Handle any other exceptions during the import process
-    print(f"Error inserting recipes: {e}")
\ No newline at end of file
+    print(f"Error inserting recipes: {e}")